@@ -23,12 +23,13 @@
 #  OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 #  SOFTWARE.
 
-import itertools
-from collections import namedtuple
+import functools
+from collections import deque
+from dataclasses import dataclass
 
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import PatternFill, Alignment, Font
 from openpyxl.styles.colors import Color
-from openpyxl.utils.indexed_list import IndexedList
 
 import mistune
 
@@ -42,13 +43,26 @@ FT_HEADER6 = Font(name="Calibri", sz=12, family=2, b=False, i=False, color=Color
 FILL_QUOTE = PatternFill(fill_type="solid", start_color='FFA09BBB', end_color='FFA09BBB')
 FILL_HRULE = PatternFill(fill_type="solid", start_color='FF000000', end_color='FF000000')
 
+# Styles that indent their content by one nesting level
+_INDENT_STYLES = frozenset(("list", "link", "quote"))
+
+# Indentation grows by steps of 2 per nesting level; precompute the usual
+# range so styling a cell is a list lookup instead of an Alignment()
+# construction.
+_ALIGNMENTS = [Alignment(indent=i) for i in range(16)]
+
 class ExcelCollectorRenderer:
     """
         This class renders a BlockCollector into an OOXML worksheet.
-        
+
         Each block item (paragraph, headline, code...) is rendered in a
         separate cell, while inline elements (including newlines) are
         placed into cells as rich text.
+
+        The worksheet is expected to belong to a write-only workbook:
+        rows are streamed with :py:func:`ws.append` instead of being
+        addressed individually, so the workbook never holds the full
+        cell grid in memory.
     """
     FONTS = {
         "h1": FT_HEADER1,
@@ -61,24 +75,40 @@ class ExcelCollectorRenderer:
     
     def __init__(self, worksheet, row = 1, col = 1):
         self.ws = worksheet
-        self.row = itertools.count(row)
+        self.row = row
         self.col = col
-    
+
     def render(self, block_collector):
         """
             Render the collector and links into the current worksheet at
-            current position.
+            current position. One row is appended per block; the start
+            position is honoured by padding with empty rows and cells.
         """
-        for row, block in zip(self.row, block_collector):
-            cell = self.ws.cell(row=row, column=self.col)
+        for _ in range(self.row - 1):
+            self.ws.append([])
+        padding = [None] * (self.col - 1)
+        for block in block_collector:
+            cell = WriteOnlyCell(self.ws)
             self.do_cell(cell, block)
+            self.ws.append(padding + [cell])
     
     def do_cell(self, cell, block):
         """
             Fill and style ``cell`` according to ``cell_properties``.
         """
-        self.prepare_cell(cell, block.content, block.styles)
-        self.fill_content(cell, block.content)
+        content = block.content
+        if content.is_plain():
+            # By far the most common case: no inline markup anywhere in
+            # the block, so a straight string value skips the rich text
+            # machinery entirely.
+            text = "".join(content.texts)
+            if "list_item" in block.styles:
+                text = "• " + text
+            cell.value = text
+        else:
+            rich_text = ["• "] if "list_item" in block.styles else []
+            self.fill_content(rich_text, content)
+            cell.rich_text = rich_text
         font, alignment, fill = self.create_style(block.styles)
         if font is not None:
             cell.font = font
@@ -87,45 +117,23 @@ class ExcelCollectorRenderer:
         if fill is not None:
             cell.fill = fill
     
-    def prepare_cell(self, cell, content, styles):
-        """
-            Prepare cell when styles influences content and vice-versa.
-        """
-        cell.rich_text = ""
-        if "list_item" in styles:
-            cell.rich_text += "• "
-    
     def create_style(self, styles):
         """
             Return a Font, Alignment and PatterFill to be applied to cells
             that shall display the given list of styles.
         """
-        font = None
-        alignment = None
-        fill = None
-        for style in styles:
-            if style in self.FONTS:
-                font = self.FONTS[style]
-            elif style in {"list", "link"}:
-                if alignment is None:
-                    alignment = Alignment()
-                alignment.indent += 2
-            elif style == "quote":
-                if alignment is None:
-                    alignment = Alignment()
-                alignment.indent += 2
-                if fill is None:
-                    fill = FILL_QUOTE
-        return font, alignment, fill
-    
-    def fill_content(self, cell, content):
+        if not styles:
+            return None, None, None
+        return _make_style(tuple(styles))
+
+    def fill_content(self, rich_text, content):
         """
-            Place the content in the cell as rich text
+            Place the content in the rich text buffer
         """
-        for element in content:
-            font = self.create_font(element.markers)
-            cell.rich_text += (element.text, font)
-    
+        rich_text.extend(
+            (text, self.create_font(markers)) for text, markers in content
+        )
+
     def create_font(self, markers):
         """
             Returns a font suitable for rich text that has been tagged with the
@@ -133,32 +141,70 @@ class ExcelCollectorRenderer:
         """
         if len(markers) == 0:
             return None
-        return Font(
-            name="Consolas" if "c" in markers else "Calibri",
-            sz=11,
-            family=3 if "c" in markers else 2,
-            b=True if "b" in markers else False,
-            i=True if "i" in markers else False,
-            color= Color(rgb="FF382DA0") if "l" in markers else Color(theme=1),
-            u='single' if "l" in markers else None,
-            strike=True if "s" in markers else None
-        )
+        return _make_font(frozenset(markers))
 
-BlockElement = namedtuple("BlockElement", ["content", "styles"])
+@functools.lru_cache(maxsize=64)
+def _make_font(markers):
+    """
+        Build the Font matching a frozenset of inline ``markers``.
+
+        Font construction is expensive and only a handful of marker
+        combinations exist, so identical combinations share one cached
+        instance.
+    """
+    return Font(
+        name="Consolas" if "c" in markers else "Calibri",
+        sz=11,
+        family=3 if "c" in markers else 2,
+        b=True if "b" in markers else False,
+        i=True if "i" in markers else False,
+        color= Color(rgb="FF382DA0") if "l" in markers else Color(theme=1),
+        u='single' if "l" in markers else None,
+        strike=True if "s" in markers else None
+    )
+
+@functools.lru_cache(maxsize=64)
+def _make_style(styles):
+    """
+        Build the (font, alignment, fill) triple matching a tuple of
+        block ``styles``, cached so recurring style stacks share the
+        same objects.
+    """
+    fonts = ExcelCollectorRenderer.FONTS
+    font = next((fonts[s] for s in styles if s in fonts), None)
+    fill = FILL_QUOTE if "quote" in styles else None
+    indent = sum(2 for s in styles if s in _INDENT_STYLES)
+    if not indent:
+        alignment = None
+    elif indent < len(_ALIGNMENTS):
+        alignment = _ALIGNMENTS[indent]
+    else:
+        alignment = Alignment(indent=indent)
+    return font, alignment, fill
+
+@dataclass(slots=True)
+class BlockElement:
+    """
+        One block destined for its own cell: the collected inline
+        content and the stack of styles applied to it.
+    """
+    content: object
+    styles: deque
 
 class BlockCollector:
     """
         Collects block type elements
     """
+    __slots__ = ("elements",)
     def __init__(self, content = None):
-        self.elements = []
+        self.elements = deque()
         if content is not None:
             self.append(content)
     def append(self, content):
         """
             Append a new block that will hold ``content``
         """
-        styles = []
+        styles = deque()
         self.elements.append(BlockElement(content, styles))
     def __iadd__(self, other):
         self.elements += other.elements
@@ -171,39 +217,70 @@ class BlockCollector:
             "nesting" effect.
         """
         for element in self.elements:
-            element.styles.insert(0, style)
+            element.styles.appendleft(style)
         return self
     def __repr__(self):
         return "<{} {!r}>".format(self.__class__.__name__, self.elements)
 
-InlineElement = namedtuple("InlineElement", ["text", "markers"])
-
 class InlineCollector:
+    """
+        Collects inline elements as two parallel arrays: the texts and
+        the frozensets of markers that style them. Iteration yields
+        ``(text, markers)`` pairs.
+    """
+    __slots__ = ("texts", "markers", "_pending")
     def __init__(self, text = None):
-        self.elements = []
+        self.texts = deque()
+        self.markers = deque()
+        self._pending = set()
         if text is not None:
             self.append(text)
+    def _flush(self):
+        # Apply the markers deferred by apply_marker to the elements
+        # collected so far. Stacked markers (e.g. bold inside italic)
+        # are unioned here in one pass instead of one pass per marker.
+        if self._pending:
+            pending = frozenset(self._pending)
+            self.markers = deque(
+                markers | pending for markers in self.markers
+            )
+            self._pending.clear()
     def append(self, text):
         """
             Append a new inline element holding ``text``
         """
-        markers = set()
-        self.elements.append(InlineElement(text, markers))
+        self._flush()
+        self.texts.append(text)
+        self.markers.append(frozenset())
         return self
     def __iadd__(self, bucket):
-        self.elements += bucket.elements
+        self._flush()
+        bucket._flush()
+        self.texts += bucket.texts
+        self.markers += bucket.markers
         return self
     def __iter__(self):
-        return iter(self.elements)
-    def apply_marker(self, marker):
+        self._flush()
+        return zip(self.texts, self.markers)
+    def apply_marker(self, *markers):
         """
-            Apply a new style marker to all elements of the collector
+            Apply one or more style markers to all elements of the
+            collector. The markers are recorded and only folded into
+            the elements when the collector is next extended or read.
         """
-        for element in self.elements:
-            element.markers.add(marker)
+        self._pending.update(markers)
         return self
+    def is_plain(self):
+        """
+            Return True when no element carries any marker, i.e. the
+            whole content can be written as one plain string.
+        """
+        return not self._pending and not any(self.markers)
     def __repr__(self):
-        return "<{} {!r}>".format(self.__class__.__name__, self.elements)
+        self._flush()
+        return "<{} {!r}>".format(
+            self.__class__.__name__, list(zip(self.texts, self.markers))
+        )
 
 class Collector:
     """
@@ -223,6 +300,12 @@ class Collector:
     # We fake the markdown processor by sending the Collector as our
     # placeholder, which will act as a spy and collect everything sent back
     # chunk by chunk by the renderer using an overloading of the += operator.
+    # Note: mistune 2.x dropped this placeholder protocol in favour of an
+    # AST renderer. Walking that token tree directly would make the whole
+    # collector layer unnecessary, but it is a rewrite of the renderer,
+    # hence the <2 pin in requirements.txt for the time being.
+    __slots__ = ("renderer", "inline", "block")
+
     def __init__(self, renderer):
         self.renderer = renderer
         self.inline = None
@@ -234,11 +317,15 @@ class Collector:
         # case, we will need to separate blocks which will end up as cells
         # and inlines which are pieces of a text inside a cell.
         # It is expected that a Collector contains only blocks or only inlines.
-        if isinstance(other, BlockCollector):
+        # Dispatch on exact type: the collector classes are never
+        # subclassed and identity checks skip the mro walk that
+        # isinstance pays on every markdown token.
+        other_type = type(other)
+        if other_type is BlockCollector:
             self._add_block(other)
-        elif isinstance(other, InlineCollector):
+        elif other_type is InlineCollector:
             self._add_inline(other)
-        elif isinstance(other, Collector):
+        elif other_type is Collector:
             # Sometimes, the markdown processor tries to combine chunks without
             # asking the renderer for a transformation. When that happens,
             # our Collector receives another Collector. We want to merge
@@ -344,14 +431,15 @@ class ExcelRenderer(mistune.Renderer):
             markdown = mistune.Markdown(renderer=renderer)
             collector = markdown(text)
             
-            wb = Workbook()
-            ws = wb.active
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet()
             collector.render(ws)
             wb.save(<output path>)
     """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.links = IndexedList()
+        # Maps each link to its 1-based footnote index, in first-seen order
+        self.links = {}
         
     def placeholder(self):
         return Collector(self)
@@ -419,7 +507,7 @@ class ExcelRenderer(mistune.Renderer):
         return InlineCollector(text).apply_marker("c")
         
     def double_emphasis(self, text):
-        return text.inline.apply_marker("i").apply_marker("b")
+        return text.inline.apply_marker("i", "b")
     
     def emphasis(self, text):
         #print("emphasis: ", text)
@@ -436,8 +524,10 @@ class ExcelRenderer(mistune.Renderer):
     
     def link(self, link, title, content):
         #print("link: ", link, title, content)
-        self.links.add(link)
-        idx = self.links.index(link) + 1
+        idx = self.links.get(link)
+        if idx is None:
+            idx = len(self.links) + 1
+            self.links[link] = idx
         return content.inline.apply_marker("l").append("[{:d}]".format(idx))
     
     def strikethrough(self, text):
@@ -461,13 +551,14 @@ class ExcelRenderer(mistune.Renderer):
             collector += BlockCollector(InlineCollector(""))
             # Each link in a special cell with format
             # "[<idx>] <link>"
-            for idx, link in enumerate(self.links, start=1):
+            for link, idx in self.links.items():
                 content = InlineCollector("[{:d}] ".format(idx))
                 content += InlineCollector(link).apply_marker("l")
                 block = BlockCollector(content).nest("link")
                 collector += block
-            # Reset links
-            self.links = IndexedList()
+            # Reset links, reusing the container on the batch path where
+            # one renderer converts several documents
+            self.links.clear()
         return collector
 
 def convert(inpath, outpath):
@@ -477,8 +568,8 @@ def convert(inpath, outpath):
     markdown = mistune.Markdown(renderer=renderer)
     with open(inpath, "r", encoding="utf-8") as fin:
         result = markdown(fin.read())
-    wb = Workbook()
-    result.render(wb.active)
+    wb = Workbook(write_only=True)
+    result.render(wb.create_sheet())
     wb.save(outpath)
 
 def cmdline():